@@ -51,13 +51,35 @@
 
 # Import packages
 import os.path
+from concurrent.futures import ThreadPoolExecutor
 import sys
 import datetime
 from datetime import date
 import numpy as np
 import scipy.io
 import matplotlib.pyplot as plt
-import csv
+
+# ANTARES files start with a line of 70 #'s
+ANTARES_HEADER = '#'*70 + '\n'
+
+# ANTARES data records are fixed width, e.g.
+# 2003 07 16 15 00 04    32114    45981.044       16.088
+# These are the character positions of each field in a record
+ANTARES_FIELDS = ((0,4),(5,7),(8,10),(11,13),(14,16),(17,19),(23,28),(32,41),(48,54))
+ANTARES_LENGTH = 54
+
+# Each record is kept as one row so that all fields move together when indexed.
+# The date, time and raw count are whole numbers and are kept as integers
+ANTARES_DTYPE = np.dtype([('yr','i2'),('mo','i1'),('dy','i1'),('hr','i1'),('mn','i1'),('sec','i1'),
+	('raw','i4'),('res','f4'),('deg','f4')])
+
+# Month abbreviations, indexed by month number
+MON_ABBR = ['','Jan','Feb','Mar','Apr','May','Jun','Jul','Aug','Sep','Oct','Nov','Dec']
+
+# Offset calibration for each logger ID, read once from the current folder
+offsets = np.genfromtxt('offsets.csv', dtype=[('id','U8'),('off','f8')], delimiter=',',
+	autostrip=True, ndmin=1)
+LOGGER_OFFSETS = dict(zip(offsets['id'].tolist(), offsets['off'].tolist()))
 
 # Modules
 ########################################################
@@ -68,20 +90,139 @@ def FindOffset(filename):
 		exit()
 	elif len(filename) >= 7:		# Some antares datalogger ID's have characters on the end, others do not.	
 		filename = filename[0:7]    # If it has a character, remove it in order to match ID with offset
-		
-		LoggerNumber = {}
-		offset_file = csv.reader(open('offsets.csv', 'r'))
-
-		for row in offset_file: 
-			LoggerNumber[row[0]] = float(row[1])
 	
-	if filename in LoggerNumber:
-		offset = LoggerNumber[filename]
+	if filename in LOGGER_OFFSETS:
+		offset = LOGGER_OFFSETS[filename]
 		print(" Found offset for this thermistor of %1.4f" % offset)
 		return offset
 	else:
 		L= (" Could not find offset for thermistor: ",filename)
 		print(''.join(L))
+
+def DateNum(yr, mo, dy, hr, mn, sec):
+	# Same as date.toordinal(date(yr+1,mo,dy)) plus the fraction of the day,
+	# worked out over whole arrays with the Gregorian calendar formula
+	a = (14 - mo.astype(np.int32))//12
+	y = yr.astype(np.int32) + 1 + 4800 - a
+	m = mo.astype(np.int32) + 12*a - 3
+	ordinal = dy.astype(np.int32) + (153*m + 2)//5 + 365*y + y//4 - y//100 + y//400 - 32045 - 1721425
+
+	# Build the time in place to avoid temporaries
+	out = sec.astype(np.float64)
+	out /= 60.0
+	out += mn
+	out /= 60.0
+	out += hr
+	out /= 24.0
+	out += ordinal
+	return out
+
+def ReadRecords(filename):
+	# This runs on a worker thread so it prints nothing, corrupt records raise a
+	# ValueError for the main thread to report. Memory map the file and find the
+	# end of the 16 line header, only the start of the file is searched for line breaks
+	buf = np.memmap(filename, dtype=np.uint8, mode='r')
+	newlines = np.flatnonzero(buf[:4096] == ord('\n'))
+	if len(newlines) < 16:
+		start = buf.size
+	else:
+		start = newlines[15] + 1
+
+	# The records all have the same length, so the line ending after the first
+	# one (\n or \r\n) gives the spacing of the rest
+	end = start + ANTARES_LENGTH
+	if end < buf.size and buf[end] == ord('\r'):
+		stride = ANTARES_LENGTH + 2
+	else:
+		stride = ANTARES_LENGTH + 1
+	count = (buf.size - end)//stride + 1
+
+	if count <= 0:
+		return np.empty(0, dtype=ANTARES_DTYPE)
+
+	if np.all(buf[start+stride-1::stride] == ord('\n')):
+		# Every record ends in a line break where the spacing says it should, so
+		# view the records as rows of characters without copying the file
+		rows = np.lib.stride_tricks.as_strided(buf[start:], shape=(count, ANTARES_LENGTH), strides=(stride, 1))
+	else:
+		# Some lines are a different length, so find where each one starts
+		# from the line breaks and skip lines too short to be a record
+		newlines = np.flatnonzero(buf[start:] == ord('\n')) + start
+		starts = np.append(start, newlines + 1)
+		ends = np.append(newlines, buf.size)
+		starts = starts[ends - starts >= ANTARES_LENGTH]
+		rows = buf[starts[:,None] + np.arange(ANTARES_LENGTH)]
+		count = starts.size
+
+	# Parse each column straight into the preallocated record array
+	rec = np.empty(count, dtype=ANTARES_DTYPE)
+	for name, (lo, hi) in zip(ANTARES_DTYPE.names, ANTARES_FIELDS):
+		if rec.dtype[name].kind == 'i':
+			# Whole numbers are worked out from their digits rather than going
+			# through a string parse. A field may only hold leading blanks, an
+			# optional minus sign and then digits, anything else is corrupt
+			field = rows[:,lo:hi]
+			isdigit = (field >= ord('0')) & (field <= ord('9'))
+			isblank = field == ord(' ')
+			isminus = field == ord('-')
+			started = np.logical_or.accumulate(~isblank, axis=1)
+			signed = np.zeros_like(started)
+			signed[:,1:] = started[:,:-1]
+			valid = isdigit | (isblank & ~started) | (isminus & ~signed)
+			if not (np.all(valid) and np.all(isdigit[:,-1])):
+				L = [" Records with bad whole numbers in: ", filename]
+				raise ValueError(''.join(L))
+
+			digits = np.where(isdigit, field.astype(np.int32) - ord('0'), 0)
+			value = digits.dot(10**np.arange(hi-lo-1, -1, -1, dtype=np.int32))
+			rec[name] = np.where(isminus.any(axis=1), -value, value)
+		else:
+			try:
+				rec[name] = np.ascontiguousarray(rows[:,lo:hi]).view('S%d' % (hi-lo))[:,0]
+			except ValueError:
+				L = [" Records with bad decimal numbers in: ", filename]
+				raise ValueError(''.join(L))
+	return rec
+
+def LoadAntares(filename, position):
+	# Check that the file is an Antares file and find the logger ID and offset
+	# from the header. position is 'Top' or 'Bottom' and is only used in the messages
+	print(' Verifying that the %s file is an Antares file' % position.lower())
+	with open(filename) as fid:
+		firstline = fid.read(71)		     # Reading in the first line 
+		if firstline != ANTARES_HEADER:
+			print(' NO: This is NOT an antares file ')
+			print(' Check that the file is the output of Antaries software')
+			exit()
+		print(' YES: This is an antares file')
+		print(' ')
+
+		# Logger ID is on the third line of the header, stream
+		# through the header instead of reading in the whole file
+		logger_id = None
+		fid.seek(0,0)
+		for i, text in enumerate(fid):
+			if i == 2:
+				logger_id = text[24:31]
+				break
+
+	if logger_id is None:
+		L = [" Could not find the logger ID in: ", filename]
+		print(''.join(L))
+		exit()
+
+	L = [" ", position, " Logger ID: ", logger_id]
+	print(''.join(L))
+	print(' ')
+
+	print(' Getting %s Thermistor Offset...' % position)
+	offset = FindOffset(logger_id)
+	if offset is None:
+		L = [" No offset for logger ID ", logger_id, " in: ", filename]
+		print(''.join(L))
+		exit()
+	print(' *************************** ')
+	return logger_id, offset
 		
 ##########################################################
 # Start of main program
@@ -93,208 +234,76 @@ file_top = sys.argv[1]
 file_bot = sys.argv[2]
 
 # Confirm that the files exist in the current director
-if os.path.isfile(file_top):
-	fid0 = open(file_top)	
-else: 
+if not os.path.isfile(file_top):
 	L = ["Unable to open file: ", file_top]
 	print(''.join(L))
 	exit()
 
-if os.path.isfile(file_bot):
-	fid1 = open(file_bot)
-else: 
+if not os.path.isfile(file_bot):
 	L = ["Unable to open file: ", file_bot]
 	print(''.join(L))
 	exit()
 
-# Now working on the top file - Loading and adjusting for offset	
-firstline = fid0.read(71)		     # Reading in the first line 
+# The two data files do not depend on each other, so each is parsed in the
+# background once its header has been checked. Only the whole number decoding
+# and the copies let go of the GIL and overlap between the two files, the casts
+# of the resistance and temperature text to floats hold it and run one at a time
+with ThreadPoolExecutor(max_workers=2) as pool:
+	tfilename, tdeg_offset = LoadAntares(file_top, 'Top')
+	top_records = pool.submit(ReadRecords, file_top)
+	bfilename, bdeg_offset = LoadAntares(file_bot, 'Bottom')
+	bot_records = pool.submit(ReadRecords, file_bot)
+
+	# Wait for both files to finish loading, any problems with the records are
+	# reported here so they do not land in the middle of the other messages
+	try:
+		trec = top_records.result()
+		brec = bot_records.result()
+	except ValueError as err:
+		print(err)
+		exit()
 
-print(' Verifying that top file is an Antares file')
-if firstline == '######################################################################\n':
-	print(' YES: This is an antares file')
-	print(' ')
-	fid0.seek(0,0)
-	total_length = len(fid0.read())//54
-	fid0.seek(0,0)
-	
-	# Initalized variables here
-	tyr = [];
-	tmo= [];
-	tdy = [];
-	thr = [];
-	tmn = [];
-	tsec = [];
-	traw = [];
-	tres = [];
-	tdeg = [];
-	
-	# Read in the header and data
-	for i in range(0,total_length):
-		text = fid0.readline()
-		if len(text) == 0:
-			break
-
-		if i == 2:
-			tfilename = text[24:31]
-		if i > 15:
-			tyr.append(text[0:4])
-			tmo.append(text[5:7])
-			tdy.append(text[8:10])
-			thr.append(text[11:13])
-			tmn.append(text[14:16])
-			tsec.append(text[17:19])
-			traw.append(text[23:28])
-			tres.append(text[32:41])
-			tdeg.append(text[48:54])
-	
-	# Convert everything to arrays
-	tyr = np.array(tyr, dtype='float32')
-	tmo = np.array(tmo, dtype='float32')
-	tdy = np.array(tdy, dtype='float32')
-	thr = np.array(thr, dtype='float32')
-	tmn = np.array(tmn, dtype='float32')
-	tsec = np.array(tsec, dtype='float32')
-	traw = np.array(traw, dtype='float32')
-	tres = np.array(tres, dtype='float32')
-	tdeg = np.array(tdeg, dtype='float32')
-				
-	L = [" Top Logger ID: ", tfilename]
+if trec.size == 0:
+	L = [" No records found in: ", file_top]
 	print(''.join(L))
-	print(' ')
-	
-	print(' Getting Top Thermistor Offset...')
-	tdeg_offset = FindOffset(tfilename)
-	
-	#from Antares_Offset_Value import offset
-	print(" Imported %1.4f" % tdeg_offset)
-	print(' *************************** ')
-	fid0.close()
-else:
-	print(' NO: This is NOT an antares file ')
-	print(' Check that the file is the output of Antaries software')
-	exit()
-	
-#Now working on the Bottom thermistor file		
-firstline = fid1.read(71)
 
-print(' Verifying that the bottom file is an Antares file')
-if firstline == '######################################################################\n':
-	print(' YES: This is an antares file')
-	print(' ')
-	fid1.seek(0,0)
-	total_length = len(fid1.read())//54
-	fid1.seek(0,0)
-
-	# Initalized variables here
-	byr = []
-	bmo = []
-	bdy = []
-	bhr = []
-	bmn = []
-	bsec = []
-	braw = []
-	bres = []
-	bdeg = []
-	
-	# Read in the header
-	for i in range(0,total_length):
-		text = fid1.readline()
-		if len(text) == 0:
-			break
-
-		if i == 2:
-			bfilename = text[24:31]
-		if i > 15:
-			byr.append(text[0:4])
-			bmo.append(text[5:7])
-			bdy.append(text[8:10])
-			bhr.append(text[11:13])
-			bmn.append(text[14:16])
-			bsec.append(text[17:19])
-			braw.append(text[23:28])
-			bres.append(text[32:41])
-			bdeg.append(text[48:54])
-			
-	# Convert everything to arrays
-	byr = np.array(byr, dtype='float32')
-	bmo = np.array(bmo, dtype='float32')
-	bdy = np.array(bdy, dtype='float32')
-	bhr = np.array(bhr, dtype='float32')
-	bmn = np.array(bmn, dtype='float32')
-	bsec = np.array(bsec, dtype='float32')
-	braw = np.array(braw, dtype='float32')
-	bres = np.array(bres, dtype='float32')
-	bdeg = np.array(bdeg, dtype='float32')
-	L = [" Bottom Logger ID: ", bfilename]
+if brec.size == 0:
+	L = [" No records found in: ", file_bot]
 	print(''.join(L))
-	print(' ')
-	
-	print(' Getting Bottom Thermistor Offset...')
-	bdeg_offset = FindOffset(bfilename)
-	
-	fid1.close()
-else:
-	print(' NO: This is NOT an antares file ')
-	exit()
 
 # Covert the time into 'matlab format'
 # Time is in matlab datenum format (Julian Day) for easy comparison 
 # and conversion between various formats.
 # 719529 = datenum(1970,1,1,0,0,0)
 
-btime = []
-ttime = []
-for i in range(0,len(byr)): 	# !! NOTE: There is a very slight rounding error of 0.0001 sec
-	timebase = date.toordinal(date(int(byr[i])+1,int(bmo[i]),int(bdy[i])))
-	dum = float(timebase) + (int(bhr[i])+(int(bmn[i])+int(bsec[i])/60.0)/60.0)/24.0
-	btime.append(dum)
-	
-for i in range(0,len(tyr)):
-	timebase1 = date.toordinal(date(int(tyr[i])+1,int(tmo[i]),int(tdy[i])))
-	dum1 = float(timebase1) + (int(thr[i])+(int(tmn[i])+int(tsec[i])/60.0)/60.0)/24.0
-	ttime.append(dum1)
-
-btime = np.array(btime, dtype='float64')
-ttime = np.array(ttime, dtype='float64')
+btime = DateNum(brec['yr'], brec['mo'], brec['dy'], brec['hr'], brec['mn'], brec['sec'])
+ttime = DateNum(trec['yr'], trec['mo'], trec['dy'], trec['hr'], trec['mn'], trec['sec'])
 
 if btime.size != ttime.size:
 	print(' Timing is off. Reconciling times between top and bottom thermistors.')
 
 # Some Quality Control
-C = np.intersect1d(btime,ttime)
-B_diff = np.in1d(btime,C)
-T_diff = np.in1d(ttime,C)
+# Match the records on whole milliseconds so the small rounding error in the
+# times can not stop two equal samples from matching. The indices of the common
+# records are returned directly, in time order
+bkey = np.rint(btime*86400e3).astype(np.int64)
+tkey = np.rint(ttime*86400e3).astype(np.int64)
+C, B_diff, T_diff = np.intersect1d(bkey, tkey, return_indices=True)
 
 btime = btime[B_diff]
-byr  = byr[B_diff]
-bmo  = bmo[B_diff]
-bdy  = bdy[B_diff]
-bhr  = bhr[B_diff]
-bmn  = bmn[B_diff]
-bsec = bsec[B_diff]
-braw = braw[B_diff]
-bres = bres[B_diff]
-bdeg = bdeg[B_diff]
-
-ttime=ttime[T_diff]
-tyr  = tyr[T_diff]
-tmo  = tmo[T_diff]
-tdy  = tdy[T_diff]
-thr  = thr[T_diff]
-tmn  = tmn[T_diff]
-tsec = tsec[T_diff]
-traw = traw[T_diff]
-tres = tres[T_diff]
-tdeg = tdeg[T_diff]
-
-# Apply offsets to the Temperatures
-tdeg_corrected = tdeg-tdeg_offset
-bdeg_corrected = bdeg-bdeg_offset
+brec = brec[B_diff]
+
+ttime = ttime[T_diff]
+trec = trec[T_diff]
+
+if ttime.size == 0:
+	print(' No records in common between top and bottom thermistors')
+	print(' Did NOT write out the golden nuggets')
+	exit()
 
 #fig = plt.figure()
-#Bot, = plt.plot(btime,bdeg_corrected,'r--',label='Bottom Corrected')
-#Top, = plt.plot(ttime,tdeg_corrected,'b--',label='Top Corrected')
+#Bot, = plt.plot(btime,brec['deg']-bdeg_offset,'r--',label='Bottom Corrected')
+#Top, = plt.plot(ttime,trec['deg']-tdeg_offset,'b--',label='Top Corrected')
 #plt.xlabel('Julian Day (datenum)')
 #plt.ylabel('Temperature (deg C)')
 #plt.legend(handles=[Bot,Top]);
@@ -309,68 +318,37 @@ if __name__ == '__main__':
 		print(" Unknown Time file!")
 		exit()
 
-latdeg = []
-latmin = []
-londeg = []
-lonmin = []
-blanket = []
-divenumber = []
-deploy = []
-jdaydep = []
-hrdep = []
-mindep = []
-jdayrec = []
-hrrec = []
-minrec = []
-
-# Confirm that the files exist in the current director and open it
+# Confirm that the files exist in the current director and read it in. Every
+# field is read as text sized to its longest value, since the blanket, dive and
+# deployment labels make up the output file names and must not be cut short
 if os.path.isfile(CSVfile):
-	with open(CSVfile) as fid:
-		lines = csv.reader(fid)
-		next(lines)
-		for row in lines:
-			latdeg.append(row[0])
-			latmin.append(row[1])
-			londeg.append(row[2])
-			lonmin.append(row[3])
-			blanket.append(row[4])
-			divenumber.append(row[5])
-			deploy.append(row[6])
-			jdaydep.append(row[7])
-			hrdep.append(row[8])
-			mindep.append(row[9])
-			jdayrec.append(row[10])
-			hrrec.append(row[11])
-			minrec.append(row[12])		
+	meta = np.genfromtxt(CSVfile, delimiter=',', skip_header=1, autostrip=True, ndmin=2,
+		dtype=str, encoding=None)
 else: 
 	L = ["Unable to open file: ", CSVfile]
 	print(''.join(L))
 	exit()     
 
-latdeg = np.array(latdeg, dtype='float32')
-latmin = np.array(latmin, dtype='float32')
-londeg = np.array(londeg, dtype='float32')
-lonmin = np.array(lonmin, dtype='float32')
-hrdep = np.array(hrdep, dtype='float32')
-mindep = np.array(mindep, dtype='float32')
-jdayrec = np.array(jdayrec, dtype='float32')
-hrrec = np.array(hrrec, dtype='float32')
-minrec = np.array(minrec, dtype='float32')
+# Columns are Lat(Deg), Lat(Min), Lon(Deg), Lon(Min), Blanket, Dive, Deployment,
+# then Julian day, hour and minute for the deployment and the recovery
+latdeg, latmin, londeg, lonmin = meta[:,0:4].T.astype('float32')
+blanket, divenumber, deploy = meta[:,4:7].T
+jdaydep, hrdep, mindep, jdayrec, hrrec, minrec = meta[:,7:13].T.astype('float32')
 
 for i in range(0,len(deploy)):
 	# Turn deployment and recovery time into date numbers
-	dum1 = datetime.datetime(byr[0],1,1)+ datetime.timedelta(int(jdaydep[i]))
+	dum1 = datetime.datetime(brec['yr'][0],1,1)+ datetime.timedelta(int(jdaydep[i]))
 	mondep = dum1.strftime('%m')
 	daydep = int(dum1.strftime('%d'))-1
 
-	dum1 = datetime.datetime(byr[-1],1,1)+ datetime.timedelta(int(jdayrec[i]))
+	dum1 = datetime.datetime(brec['yr'][-1],1,1)+ datetime.timedelta(int(jdayrec[i]))
 	monrec = dum1.strftime('%m')
 	dayrec = int(dum1.strftime('%d'))-1
 
-	timebase = date.toordinal(date(int(byr[0])+1,int(mondep),daydep))
+	timebase = date.toordinal(date(int(brec['yr'][0])+1,int(mondep),daydep))
 	TimeDeployed = float(timebase) + (int(hrdep[i])+(int(mindep[i]))/60.0)/24.0		
 	
-	timebase = date.toordinal(date(int(byr[-1])+1,int(monrec),dayrec))
+	timebase = date.toordinal(date(int(brec['yr'][-1])+1,int(monrec),dayrec))
 	TimeRecovered = float(timebase) + (int(hrrec[i])+(int(minrec[i]))/60.0)/24.0
 
 	# Display info
@@ -383,9 +361,10 @@ for i in range(0,len(deploy)):
 	print(''.join(K))
 
 	# Find corresponding deployment times in *.mat file
-	start = np.where(ttime >= TimeDeployed)
-	end = np.where(ttime <= TimeRecovered)
-	a = np.intersect1d(start,end)
+	# ttime is sorted after the quality control, so the window is a binary search
+	start = np.searchsorted(ttime, TimeDeployed, side='left')
+	end = np.searchsorted(ttime, TimeRecovered, side='right')
+	a = np.arange(start, end)
 
 	if a.size == 0:
 		L = (' *************  Wrong times for deployment: ',deploy[i],'!! **************')
@@ -405,17 +384,24 @@ for i in range(0,len(deploy)):
 	L = (str(divenumber[i]),'_',blanket[i],'_',deploy[i],'.dat')
 	M = "".join(L)
 	
-	depmon = datetime.date(byr[0], int(mondep), 1).strftime('%b')
-	recmon = datetime.date(byr[0], int(monrec), 1).strftime('%b')
+	depmon = MON_ABBR[int(mondep)]
+	recmon = MON_ABBR[int(monrec)]
+
+	# Pull out the records for this deployment once and apply the offsets
+	# to the Temperatures, only the deployment window is ever corrected
+	top = trec[a]
+	bot = brec[a]
+	tdeg_corrected = top['deg']-tdeg_offset
+	bdeg_corrected = bot['deg']-bdeg_offset
 
 	# Write out the Matlab *.mat file 
 	lon = londeg[i] - (lonmin[i]/60)
-	lat = latdeg[1] + (latdeg[i]/60)
+	lat = latdeg[i] + (latmin[i]/60)
 	scipy.io.savemat(M, mdict={'DateTime': ttime[a],'rectimev': TimeRecovered,'deptimev': TimeDeployed,
-		'Top': tdeg_corrected[a],'Bot': bdeg_corrected[a],'Longitude': lon, 'Latitude': lat})
+		'Top': tdeg_corrected,'Bot': bdeg_corrected,'Longitude': lon, 'Latitude': lat})
 		
 	# Write the 'Golden Nugget' file
-	with open(M,'w') as OutputFile:
+	with open(M,'w', buffering=1<<20) as OutputFile:
 		L = ('Creating ',M,'...')
 		print(''.join(L))
 		
@@ -439,18 +425,23 @@ for i in range(0,len(deploy)):
 		OutputFile.write(' Lat [dec-min] : %f \n' % latmin[i])
 		OutputFile.write('--------------------------------------------------------\n')
 		OutputFile.write(' Deployment Time Information\n')
-		OutputFile.write(' Date/Time Deployed  : %s-%s-%d %2.0f:%2.0f:00 \n' % (daydep,depmon,byr[0],int(hrdep[i]),int(mindep[i])))
-		OutputFile.write(' Date/Time Recovered : %s-%s-%d %2.0f:%2.0f:00 \n' % (dayrec,recmon,byr[0],int(hrrec[i]),int(minrec[i])))
+		OutputFile.write(' Date/Time Deployed  : %s-%s-%d %2.0f:%2.0f:00 \n' % (daydep,depmon,brec['yr'][0],int(hrdep[i]),int(mindep[i])))
+		OutputFile.write(' Date/Time Recovered : %s-%s-%d %2.0f:%2.0f:00 \n' % (dayrec,recmon,brec['yr'][0],int(hrrec[i]),int(minrec[i])))
 		OutputFile.write('-------------------------- End Header -------------------\n')
 		OutputFile.write(' \n')
 		OutputFile.write('  Date-Time              Bottom   Bottom    Bottom    Bottom    Top      Top        Top      Top\n')
 		OutputFile.write('                         [raw]    [ohm]      T[C]    T(offset) [raw]    [ohm]       T[C]   T(offset)\n')
 
 		# Write rest of Data
-		for j in range(0,len(a)):
-			mnhalf = datetime.date(byr[0], int(tmo[i]), 1).strftime('%b')
-			OutputFile.write('%d-%s-%5d %02.0f:%02.0f:%02.0f     %5.0f  %5.4f   %1.4f   %1.4f   %5.0f  %5.4f   %1.4f   %1.4f\n' % (tdy[a[j]],
-			mnhalf,tyr[a[j]],thr[a[j]],tmn[a[j]],tsec[a[j]],braw[a[j]],bres[a[j]],bdeg[a[j]],bdeg_corrected[a[j]],traw[a[j]],tres[a[j]],tdeg[a[j]],tdeg_corrected[a[j]]))
-			
-			
-			
+		# The columns are stacked into one block so that rows can be formatted by
+		# a single call, which keeps the row loop in C. The rows are in time order,
+		# so they are written in runs of the same month with the month name put
+		# straight into the format
+		values = np.column_stack((top['dy'], top['yr'], top['hr'], top['mn'], top['sec'],
+			bot['raw'], bot['res'], bot['deg'], bdeg_corrected,
+			top['raw'], top['res'], top['deg'], tdeg_corrected))
+		months = top['mo']
+		runs = np.flatnonzero(np.diff(months, prepend=-1))
+		for block, mo in zip(np.split(values, runs[1:]), months[runs]):
+			fmt = '%d-' + MON_ABBR[mo] + '-%5d %02.0f:%02.0f:%02.0f     %5.0f  %5.4f   %1.4f   %1.4f   %5.0f  %5.4f   %1.4f   %1.4f\n'
+			OutputFile.write((fmt*len(block)) % tuple(block.ravel().tolist()))